@@ -1,6 +1,7 @@
-from lib.pdf_gen import PackProfile, WhiteCardWriter, BlackCardWriter, CardBackWriter
+from lib.pdf_gen import PackProfile, WhiteCardWriter, BlackCardWriter, CardBackWriter, CardManifest
 
 from configparser import ConfigParser
+from os import remove
 from os.path import basename, dirname, exists, isdir, join, realpath, splitext
 
 import click
@@ -70,9 +71,18 @@ def validate_output(ctx, param, value):
         raise click.BadParameter(repr(value) + " does not exist")
 
 
+def validate_since(ctx, param, value):
+    if value is None:
+        return value
+    try:
+        return CardManifest.load(value)
+    except (ValueError, UnicodeDecodeError):
+        raise click.BadParameter(repr(value) + " is not a card manifest")
+
+
 def validate_positive(ctx, param, value):
-    if value <= 0:
-        raise click.BadParameter(param.name + " needs to be at positive number")
+    if value is not None and value <= 0:
+        raise click.BadParameter(param.name + " needs to be a positive number")
     return value
 
 
@@ -127,6 +137,13 @@ stripe color. If a color is given but no text is given, a stripe will still be p
 help_output = "Output file to write the pdf files. Defaults to {}"
 help_contains = "Limit the printed colors to anything containing the given string. \
 Remember that this will not be the entire list available. Does not support wildcard at the moment."
+help_since = "Manifest file of a previous build. If given, only the cards that were added or changed since that \
+build are printed, to [white or black]_delta.pdf. Every build writes its manifest next to the pdf, as \
+[white or black].manifest or [white or black]_delta.manifest"
+help_sample = "Only print this many cards, picked at random across all the lists, to [white or black]_sample.pdf"
+help_seed = "Random seed for --sample or --proof, to pick the same cards again. Only valid with one of those"
+help_proof = "Print a proof sheet to [white or black]_proof.pdf instead, with the backs and their pack stripes. \
+Picks a random page worth of cards unless --sample is given"
 help_duplex = "If set then the backs will be written alternating the fronts."
 help_is_black = "Print as black cards"
 
@@ -172,22 +189,41 @@ def cli():
 @click.option("--icon-width", default=loaded_defaults["icon_width"], callback=validate_positive, help=help_icon_width)
 @click.option("--output", type=click.Path(), default=loaded_defaults["output"], callback=validate_output,
               help=help_output.format(join(hc_defaults["output"], "white.pdf")))
+@click.option("--since", type=click.Path(exists=True, dir_okay=False), default=None, callback=validate_since,
+              help=help_since)
+@click.option("--sample", type=int, default=None, callback=validate_positive, help=help_sample)
+@click.option("--seed", type=int, default=None, help=help_seed)
+@click.option("--proof", is_flag=True, help=help_proof)
 @click.option("--duplex", is_flag=True, help=help_duplex)
 @click.argument("lists", nargs=-1, type=click.File())
 def white(width, height, side_margin, tb_margin, title, release_title_restrict,
-          front_fs, back_fs, icon, icon_width, output, duplex, lists):
+          front_fs, back_fs, icon, icon_width, output, since, sample, seed, proof,
+          duplex, lists):
     """Standard white card generator, given files that are lists of the contents of the cards, ignoring .pp files.
     Writes to white.pdf, in the --output directory if supplied or current directory otherwise, and will replace
-    any preexisting file."""
-
-    output = join(output if output else '.', "white.pdf")  # FIXME verify default output
+    any preexisting file. The manifest of the printed cards is written next to it as white.manifest, to be given
+    to --since for reprinting only the cards that changed into white_delta.pdf. A delta build still writes the manifest
+    of the whole deck, as white_delta.manifest. Sampled prints go to white_sample.pdf and proof prints to
+    white_proof.pdf, and neither writes a manifest."""
+
+    if seed is not None and not (sample or proof):
+        raise click.BadParameter("--seed needs --sample or --proof", param_hint="'--seed'")
+    name = "white_proof" if proof else "white_sample" if sample else "white_delta" if since else "white"
+    output = join(output if output else '.', name + ".pdf")  # FIXME verify default output
     writer = WhiteCardWriter(output, width, height, side_margin, tb_margin, front_fs, back_fs,
-                             title, icon, icon_width, duplex)
+                             title, icon, icon_width, duplex or proof)
     for file in lists:
         if splitext(file.name)[1] == ".pp":
             continue
         writer.add_pack(file, replace_ext(file.name, "pp"))
-    writer.write()
+    if since:
+        writer.print_since(since)
+    if sample or proof:
+        writer.print_sample(sample or writer.grid_size, seed)
+    if not writer.write(None if sample or proof else replace_ext(output, "manifest")) and since:
+        if exists(output):
+            remove(output)  # an older delta would otherwise look like this build's
+        click.echo("No cards were added or changed since the --since manifest, " + output + " was not written")
 
 
 @cli.command(short_help="process black card lists")
@@ -206,22 +242,41 @@ def white(width, height, side_margin, tb_margin, title, release_title_restrict,
 @click.option("--icon-width", default=loaded_defaults["icon_width"], callback=validate_positive, help=help_icon_width)
 @click.option("--output", type=click.Path(), default=loaded_defaults["output"], callback=validate_output,
               help=help_output.format(join(hc_defaults["output"], "black.pdf")))
+@click.option("--since", type=click.Path(exists=True, dir_okay=False), default=None, callback=validate_since,
+              help=help_since)
+@click.option("--sample", type=int, default=None, callback=validate_positive, help=help_sample)
+@click.option("--seed", type=int, default=None, help=help_seed)
+@click.option("--proof", is_flag=True, help=help_proof)
 @click.option("--duplex", is_flag=True, help=help_duplex)
 @click.argument("lists", nargs=-1, type=click.File())
 def black(blank, width, height, side_margin, tb_margin, title, release_title_restrict,
-          front_fs, back_fs, icon, icon_width, output, duplex, lists):
+          front_fs, back_fs, icon, icon_width, output, since, sample, seed, proof,
+          duplex, lists):
     """Standard black card generator, given files that are lists of the contents of the cards, ignoring .pp files.
     Writes to black.pdf, in the --output directory if supplied or current directory otherwise, and will replace
-    any preexisting file."""
-
-    output = join(output if output else '.', "black.pdf")  # FIXME verify default output
+    any preexisting file. The manifest of the printed cards is written next to it as black.manifest, to be given
+    to --since for reprinting only the cards that changed into black_delta.pdf. A delta build still writes the manifest
+    of the whole deck, as black_delta.manifest. Sampled prints go to black_sample.pdf and proof prints to
+    black_proof.pdf, and neither writes a manifest."""
+
+    if seed is not None and not (sample or proof):
+        raise click.BadParameter("--seed needs --sample or --proof", param_hint="'--seed'")
+    name = "black_proof" if proof else "black_sample" if sample else "black_delta" if since else "black"
+    output = join(output if output else '.', name + ".pdf")  # FIXME verify default output
     writer = BlackCardWriter(output, width, height, side_margin, tb_margin, front_fs, back_fs,
-                             title, icon, icon_width, duplex, blank)
+                             title, icon, icon_width, duplex or proof, blank)
     for file in lists:
         if splitext(file.name)[1] == ".pp":
             continue
         writer.add_pack(file, replace_ext(file.name, "pp"))
-    writer.write()
+    if since:
+        writer.print_since(since)
+    if sample or proof:
+        writer.print_sample(sample or writer.grid_size, seed)
+    if not writer.write(None if sample or proof else replace_ext(output, "manifest")) and since:
+        if exists(output):
+            remove(output)  # an older delta would otherwise look like this build's
+        click.echo("No cards were added or changed since the --since manifest, " + output + " was not written")
 
 
 @cli.command(short_help="print single page of card backs")
@@ -1,12 +1,17 @@
 from lib.img_size import get_image_size
 
+from collections import Counter
 from configparser import ConfigParser
 from copy import deepcopy
+from hashlib import sha1
+from random import Random
 
 from reportlab.lib.colors import black, white, getAllNamedColors, HexColor, Color
+from reportlab.lib.fonts import tt2ps
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen.canvas import Canvas
 from reportlab.platypus import Paragraph
 
@@ -58,6 +63,40 @@ class PackProfile:
             config.write(file)
 
 
+class CardManifest:
+    def __init__(self, counts=None):
+        self.counts = Counter(counts or {})
+
+    def __getitem__(self, card_hash):
+        return self.counts[card_hash]
+
+    def add(self, card_hash):
+        self.counts[card_hash] += 1
+
+    @staticmethod
+    def card_hash(card, profile):
+        digest = sha1(str(card).encode("utf-8"))
+        if profile:
+            digest.update(b"\0" + (profile.name or '').encode("utf-8"))
+            digest.update(b"\0" + (profile.color.hexval() if profile.color else '').encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def load(filename):
+        counts = Counter()
+        with open(filename) as file:
+            for line in file:
+                if line.strip():
+                    card_hash, count = line.split()
+                    counts[card_hash] = int(count)
+        return CardManifest(counts)
+
+    def write(self, filename):
+        with open(filename, mode='w') as file:
+            for card_hash, count in sorted(self.counts.items()):
+                file.write("{} {}\n".format(card_hash, count))
+
+
 class _PDFWriter:
     GRID_DRAW_ON_PAGES = 1
     GRID_DRAW_SEPARATE = 2
@@ -69,6 +108,7 @@ class _PDFWriter:
     page_width, page_height = letter
     title_front_fs = 7
     default_font = "Helvetica-Bold"
+    markup_chars = ('<', '>', '&', '\xa0', '\xad')
 
     def __init__(self, filename, card_width, card_height, card_side_margin, card_tb_margin, front_fs, back_fs,
                  game_title, icon_fn, icon_width, duplex, text_color, font):
@@ -88,6 +128,8 @@ class _PDFWriter:
         self.front_style.fontSize = front_fs
         self.front_style.leading = round(front_fs * 1.2)
         self.front_style.textColor = text_color
+        self.plain_font = tt2ps(self.front_style.fontName, 1, 0)
+        self.word_widths = dict()
 
         self.back_style = deepcopy(getSampleStyleSheet()["Normal"])
         self.back_style.fontName = "Helvetica-Bold"
@@ -108,6 +150,10 @@ class _PDFWriter:
 
         self.packs = []
         self.file = None
+        self.since = None
+        self.manifest = CardManifest()
+        self.sample = None
+        self.sample_seed = None
 
         self._process_grid()
         self._process_back_p()
@@ -186,6 +232,58 @@ class _PDFWriter:
 
         return start_x, start_y, end_x, end_y
 
+    def _plain_style(self):
+        # the fast path only copies Paragraph's plain greedy breaking, so hyphenation or wrap modes need Paragraph
+        return (not getattr(self.front_style, "hyphenationLang", None)
+                and not getattr(self.front_style, "embeddedHyphenation", 0)
+                and not getattr(self.front_style, "uriWasteReduce", 0)
+                and getattr(self.front_style, "wordWrap", None) is None)
+
+    def _plain_text(self, content):
+        if self._plain_style() and content.startswith("<b>") and content.endswith("</b>"):
+            text = content[3:-4]
+            if not any(char in text for char in self.markup_chars):
+                return text
+        return None
+
+    def _word_width(self, word):
+        if word not in self.word_widths:
+            self.word_widths[word] = stringWidth(word, self.plain_font, self.front_style.fontSize)
+        return self.word_widths[word]
+
+    def _break_lines(self, text, width):
+        # same greedy breaking as a single bold fragment Paragraph, None where Paragraph would split a word
+        space_width = self._word_width(' ')
+        shrink = getattr(self.front_style, "spaceShrinkage", 0) * space_width
+        lines = []
+        line = []
+        line_width = -space_width
+        for word in text.split():
+            word_width = self._word_width(word)
+            if word_width > width:
+                return None
+            new_width = line_width + space_width + word_width
+            if new_width <= width + shrink * len(line) or not line:
+                line.append(word)
+                line_width = new_width
+            else:
+                lines.append(' '.join(line))
+                line = [word]
+                line_width = word_width
+        if line:
+            lines.append(' '.join(line))
+        return lines
+
+    def _draw_lines(self, lines, start_x, start_y):
+        self.file.saveState()
+        text = self.file.beginText(start_x, start_y - self.front_style.fontSize)
+        text.setFont(self.plain_font, self.front_style.fontSize, self.front_style.leading)
+        text.setFillColor(self.front_style.textColor)
+        for line in lines:
+            text.textLine(line)
+        self.file.drawText(text)
+        self.file.restoreState()
+
     def _draw_grid(self):
         self.file.setStrokeColor(self.text_color)
         for x in range(self.cards_wide + 1):
@@ -215,9 +313,14 @@ class _PDFWriter:
                                      end_y + self.icon_height // 2 - self.title_front_fs // 2,
                                      self.game_title)
 
-                card_p = Paragraph(content, self.front_style)
-                size = card_p.wrap(abs(end_x - start_x), abs(end_y - start_y))
-                card_p.drawOn(self.file, start_x, start_y - size[1])
+                text = self._plain_text(content)
+                lines = self._break_lines(text, abs(end_x - start_x)) if text is not None else None
+                if lines is not None:
+                    self._draw_lines(lines, start_x, start_y)
+                else:
+                    card_p = Paragraph(content, self.front_style)
+                    size = card_p.wrap(abs(end_x - start_x), abs(end_y - start_y))
+                    card_p.drawOn(self.file, start_x, start_y - size[1])
 
         self.file.showPage()
 
@@ -262,10 +365,29 @@ class _PDFWriter:
     def _card_generator(self):
         for pack, profile in self.packs:
             for card in self._process_pack(pack):
-                yield card, profile
+                card_hash = CardManifest.card_hash(card, profile)
+                self.manifest.add(card_hash)
+                if self.since is None or self.manifest[card_hash] > self.since[card_hash]:
+                    yield card, profile
+
+    def _sample_generator(self, card_gen):
+        # reservoir sampling, kept in the original card order
+        rand = Random(self.sample_seed)
+        reservoir = []
+        for i, card in enumerate(card_gen):
+            if i < self.sample:
+                reservoir.append((i, card))
+            else:
+                j = rand.randrange(i + 1)
+                if j < self.sample:
+                    reservoir[j] = (i, card)
+        for _, card in sorted(reservoir, key=lambda indexed: indexed[0]):
+            yield card
 
     def _page_generator(self):
         card_gen = self._card_generator()
+        if self.sample is not None:
+            card_gen = self._sample_generator(card_gen)
         page = []
         try:
             while True:
@@ -281,11 +403,26 @@ class _PDFWriter:
         profile = self._process_profile(profile)
         self.packs.append((pack, profile))
 
-    def write(self):
+    def print_since(self, manifest):
+        self.since = CardManifest.load(manifest) if isinstance(manifest, str) else manifest
+
+    def print_sample(self, size, seed=None):
+        self.sample = size
+        self.sample_seed = seed
+
+    def write(self, manifest_fn=None):
+        # the manifest is filled while the packs are read, so it can only be written here
+        self.manifest = CardManifest()
         self.file = Canvas(self.filename, pagesize=letter)
+        pages = 0
         for page in self._page_generator():
             self._draw_page(page)
-        self.file.save()
+            pages += 1
+        if pages or self.since is None:
+            self.file.save()
+        if manifest_fn:
+            self.manifest.write(manifest_fn)
+        return pages
 
 
 class WhiteCardWriter(_PDFWriter):